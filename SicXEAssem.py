@@ -15,6 +15,8 @@
 
 import sys
 import io
+import re
+import functools
 
 OPTAB = {'ADD':'18', 'ADDF':'58', 'ADDR':'90', 'AND':'40', 'CLEAR':'B4', 
            'COMP':'28', 'COMPF':'88', 'COMPR':'A0', 'DIV':'24', 'DIVF':'64',
@@ -39,61 +41,54 @@ FORM2 = {"ADDR":"90", "CLEAR":"B4", "COMPR":"A0", "DIVR":"9C", "MULR":"98",
          "RMO":"AC", "SHIFTL":"A4", "SHIFTR":"A8", "SUBR":"94", "SVC":"B0",
          "TIXR":"B8"}
 
-REGS = {"A":"0", "X":"1", "L":"2", "B":"3", "S":"4", "T":"5", "F":"6",
-        "PC":"8", "SW":"9"}
-
-def FindColumn(strline):
-    # This function splits each line into a list and then checks to see if
-    # the first element is in the opcodes dictionary. If not, we know it is
-    # a variable name. If it is in the dictionary, we insert an empty string
-    # at the beginning of the list. Therefore, we can distinguish between
-    # labels, mnemonics, operands and comments. The first index will always
-    # be a label, the second will be a mnemonic, the third will be an operand
-    # and the last will be a comment, which we remove from the list.
-
-    # We create an empty string to replace tabs
-    newstrline = ""
-
-    # We search for tabs in the string and replace them with spaces in new file
-    for char in strline:
-
-        # If we find a tab, we add a space to the new string
-        if (char == '\t'):
-            newchar = ' '
-            newstrline += newchar
-
-        # Otherwise we add the character to the new string
+# Maps each directive and format 1/2 mnemonic to how it advances LOCCTR,
+# anything not in the table is a 3 byte instruction
+SIZE_TAB = {"START":("START", 0), "RESW":("RES", 3), "RESB":("RES", 1),
+            "WORD":("FIXED", 3), "BYTE":("BYTE", 0)}
+SIZE_TAB.update({mnemonic: ("FIXED", 1) for mnemonic in FORM1})
+SIZE_TAB.update({mnemonic: ("FIXED", 2) for mnemonic in FORM2})
+
+def BuildOpcodeInfo():
+    # This function maps every mnemonic, including the '+' format 4
+    # variants, to its instruction format and opcode (as an integer) so it
+    # can be found with a single lookup
+
+    opcodeinfo = {}
+
+    for mnemonic in OPTAB:
+        if (mnemonic in FORM1):
+            opcodeinfo[mnemonic] = (1, int(FORM1[mnemonic], 16))
+        elif (mnemonic in FORM2):
+            opcodeinfo[mnemonic] = (2, int(FORM2[mnemonic], 16))
         else:
-            newstrline += char
+            opcodeinfo[mnemonic] = (3, int(OPTAB[mnemonic], 16))
+            opcodeinfo['+' + mnemonic] = (4, int(OPTAB[mnemonic], 16))
 
-    # Initialize empty array to hold each column
-    columns = []
+    return opcodeinfo
 
-    # We check to see if there is a label or not
-    if (newstrline[0] == ' '):
-        
-        # If there is a space, there is no label so we create an empty column
-        columns.append("    ")
-            
-    # We split the new string based on the spaces
-    precols = newstrline.split()
+OPCODE_INFO = BuildOpcodeInfo()
 
-    # We add each of the elements of the split string into the columns list
-    for elem in precols:
-        columns.append(elem)
+# Matches the label, mnemonic and operand columns of a source line, the
+# label is empty when the line starts with whitespace
+LINE_RE = re.compile(r'(\S*)\s*(\S*)\s*(\S*)')
 
-    # If the length of the list is greater than 3, we delete all elements
-    # in the list after index 2 because they are comments
-    if (len(columns) > 3):
-        while (len(columns) > 3):
-            columns.pop()
+REGS = {"A":"0", "X":"1", "L":"2", "B":"3", "S":"4", "T":"5", "F":"6",
+        "PC":"8", "SW":"9"}
 
-    # We want the length to be exactly 3, so we append empty strings
-    if (len(columns) < 3):
-        while (len(columns) < 3):
-            columns.append("")
+def FindColumn(strline):
+    # This function splits each line into a list of columns. If the line
+    # starts with whitespace there is no label, so we use an empty column in
+    # its place. Therefore, we can distinguish between labels, mnemonics,
+    # operands and comments. The first index will always be a label, the
+    # second will be a mnemonic, the third will be an operand and the
+    # comment is removed from the list.
+
+    # We match the first three columns of the line, anything after them
+    # is a comment and is ignored
+    label, mnemonic, operand = LINE_RE.match(strline).groups()
 
-    return columns
+    # If there is no label, we create an empty column
+    return [label or "    ", mnemonic, operand]
 
 def FindOffset(columns):
     # This function finds the offset of each line in the input file and
@@ -102,55 +97,45 @@ def FindOffset(columns):
     # The offset of each line is determined by the LOCCTR global variable
     global LOCCTR
 
-    if (columns[1] == "BASE" or columns[0][0] == '.'):
-        columns.insert(0, "     ")
+    if (columns[1] == "BASE" or columns[0].startswith('.')):
+        columns.insert(0, None)
         return
 
-    # Insert the hexadecimal offset at index 0
-    columns.insert(0, hex(LOCCTR)[2:].zfill(5))
+    # Insert the offset at index 0, it is only converted to hex when printed
+    columns.insert(0, LOCCTR)
 
-    if (columns[2] == "START"):
-        LOCCTR = int(columns[3], 16)
+    # Format 4 instructions are always 4 bytes
+    if (columns[2][:1] == "+"):
+        LOCCTR += 4
+        return
 
     # Finds how many bytes to add to the offset based on the mnemonic
-    elif (columns[2] in FORM2):
-        LOCCTR += 2
+    kind, size = SIZE_TAB.get(columns[2], ("FIXED", 3))
 
-    elif (columns[2] in FORM1):
-        LOCCTR += 1
+    if (kind == "FIXED"):
+        LOCCTR += size
 
-    elif (columns[2][0] == "+"):
-        LOCCTR += 4
+    elif (kind == "RES"):
+        LOCCTR += int(columns[3]) * size
 
-    elif (columns[2] == "RESW"):
-        LOCCTR += (int(columns[3]) * 3)
-
-    elif (columns[2] == "RESB"):
-        LOCCTR += int(columns[3])
-
-    elif (columns[2] == "WORD"):
-        LOCCTR += 3
+    elif (kind == "START"):
+        LOCCTR = int(columns[3], 16)
 
-    elif (columns[2] == "BYTE"):
-        if (columns[3][0] == 'C'):
-            LOCCTR += len(columns[3]) - 3
+    elif (kind == "BYTE"):
 
-        elif (columns[3][0] == 'X'):
-            counter = 0
-            
-            for char in columns[3]:
-                counter += 1
+        # The body of the constant is between the quotes
+        body = columns[3][2:-1]
 
-            counter = counter - 3
+        if (columns[3].startswith('C')):
+            LOCCTR += len(body)
 
-            LOCCTR += counter / 2
+        # Every two hex digits is one byte, an odd digit is padded to a byte
+        elif (columns[3].startswith('X')):
+            LOCCTR += (len(body) + 1) // 2
 
         else:
             LOCCTR += 1
 
-    else:
-        LOCCTR += 3
-
     return
 
 def FillSymTab(columns):
@@ -159,10 +144,11 @@ def FillSymTab(columns):
     if columns[1] == "    ":
         return
 
-    elif (columns[1] == '.'):
+    elif (columns[1].startswith('.')):
         return
 
-    # Otherwise we add a new key:value pair to the symbol table
+    # Otherwise we add a new key:value pair to the symbol table, the
+    # address is kept as an integer and only formatted when it is output
     else:
         SYMTAB[columns[1]] = columns[0]
         return
@@ -175,7 +161,12 @@ def FirstPass(filename):
     with open(filename) as inputFile:
 
         # Iterate through each line in the input file
-        for line in inputFile:
+        for line in inputFile.read().splitlines():
+
+            # Skip blank lines
+            if (not line or line.isspace()):
+                continue
+
             # Creates a list of each string in the line
             cols = FindColumn(line)
 
@@ -190,241 +181,189 @@ def FirstPass(filename):
             # Checks for labels and adds to the symbol table
             FillSymTab(cols)
 
-        print("Symbol Table:")
-        for elem in SYMTAB:
-            print(elem),
-            print("  :  "),
-            print(SYMTAB.get(elem))
-        print('\n')
+    # Print the symbol table in a single write
+    print("Symbol Table:")
+    print('\n'.join(label + "  :  " + format(addr, '05x')
+                    for label, addr in SYMTAB.items()))
+    print('\n')
 
     return parseinfo
     
-def NIbits(operand):
-
-    addint = 0
-
-    if (operand[0] == '#'):
-        addint = 1
-
-    elif (operand[0] == '@'):
-        addint = 2
-
+def FindOpcode(opbyte, operand):
+
+    # We add the value of the n and i bits to the opcode, RSUB has no
+    # operand so it always gets 3
+    if (operand.startswith('#')):
+        opbyte += 1
+    elif (operand.startswith('@')):
+        opbyte += 2
     else:
-        addint = 3
-
-    return addint
-
-def FindOpcode(opcode, operand):
-
-    # We convert the opcode (string) from hex to an integer
-    intval = int(opcode, 16)
-
-    # We check for RSUB and add 3
-    if (opcode == "4C"):
-        intval += 3
-
-    # Otherwise, we find the value of the n and i bits
-    else:
-        # We add the value returned to the value of the opcode
-        intval += NIbits(operand)
+        opbyte += 3
 
     # We convert the new integer into a hex string
-    codeval = hex(intval)[2:]
-
-    return codeval.zfill(2)
+    return format(opbyte, '02x')
 
-def Format4(opcode, operand, curraddr):
+def Format4(opbyte, opcode, operand, curraddr, baseaddr):
 
-    # Initilializing empty string to return
-    formatstring = ""
-
-    code = OPTAB.get(opcode[1:])
+    # Initialize empty list of parts to join and return
+    parts = []
 
     # Insert the opcode into the string
-    formatstring += FindOpcode(code, operand)
+    parts.append(FindOpcode(opbyte, operand))
 
-    # Insert the XBPE bits into the string
-    formatstring += XBPE(opcode, operand, curraddr)
+    # The XBPE bits, format 4 always sets the 'e' bit and sets the 'x' bit
+    # if the operand is indexed
+    xbpe = '9' if operand.endswith(',X') else '1'
 
     # There is an exception for RSUB
-    if (opcode == "RSUB"):
+    if (opcode == "+RSUB"):
         
-        # We add 4 0's to the string in the case of +RSUB
-        formatstring += "0000"
+        # We add 5 0's for the address in the case of +RSUB
+        parts.append(xbpe)
+        parts.append("00000")
         
-        return formatstring
+        return ''.join(parts)
 
     # Check if operand is immediate or indirect 
-    if (operand[0] == '#' or operand[0] == '@'):
+    if (operand[:1] in '#@'):
 
         # We remove the leading character
         newstr = operand[1:]
 
         # We check if the operand is in the symbol table
-        if (newstr in SYMTAB):
-            # We insert the correct address retrieved from the symbol table
-            formatstring += SYMTAB.get(newstr)
+        labeladdr = SYMTAB.get(newstr)
 
         # Otherwise, we know that it is a constant value > 4096
-        else:
-            # Get last 5 digits of value and convert to hex and append
-            formatstring += hex(int(newstr))[2:].zfill(5)
+        if (labeladdr is None):
+            if (not newstr.isdigit()):
+                print("Error: Incorrect format 4 instruction - " + operand)
+                return ''.join(parts)
+
+            # The constant has to fit in the 20 bit address
+            labeladdr = int(newstr)
+            if (labeladdr > 0xFFFFF):
+                print("Error: Constant out of range for format 4 - " +
+                      newstr)
+                return ''.join(parts)
 
     # Check if the operand uses index
-    elif (operand[len(operand) - 1] == 'X'):
+    elif (operand.endswith(',X')):
         
-        if (operand[:len(operand) - 2] in SYMTAB):
-            formatstring += SYMTAB.get(operand[:len(operand) - 2])
+        labeladdr = SYMTAB.get(operand[:-2])
+        if (labeladdr is None):
+            print("Error: Operand not a label - " + operand[:-2])
+            return ''.join(parts)
 
-        else:
-            print("Error: Operand not a label.")
+    else:
+        labeladdr = SYMTAB.get(operand)
 
-    # We check if the operand is in the symbol table
-    elif (operand in SYMTAB):
-        
-        # Retrieve the address from the symbol table
-        formatstring += SYMTAB.get(operand)
+        # We check if the operand is in the symbol table, otherwise, print
+        # error
+        if (labeladdr is None):
+            print("Error: Incorrect format 4 instruction - " + operand)
+            return ''.join(parts)
 
-    # Otherwise, print error
-    else:
-        print("Error: Incorrect format 4 instruction")
+    # Insert the XBPE bits and the address into the string
+    parts.append(xbpe)
+    parts.append(format(labeladdr, '05x'))
 
-    return formatstring
+    return ''.join(parts)
 
 def TwoComp(disp):
 
-    # Convert the integer into a binary string
-    bin_disp = bin(disp)[3:].zfill(12)
-
-    newbin = ""
+    # Mask the displacement to 12 bits to get its two's complement
+    hexdisp = hex(disp & 0xFFF)[2:].zfill(3)
 
-    # Iterate through the binary string and flip each of the bits
-    for char in bin_disp:
-        if (char == '0'):
-            newbin = newbin + '1'
-        else:
-            newbin = newbin + '0'
+    return hexdisp
 
-    hexdisp = hex((int(newbin, 2) + 1))[2:].zfill(3)
+def EncodeDisp(curraddr, labeladdr, baseaddr):
+    # This function works only on integers. It returns the 'b'/'p' bits of
+    # the instruction and the displacement to the label, which is relative
+    # to the next instruction when it is in range for PC-relative addressing
+    # and relative to the base register otherwise. If the label is in range
+    # of neither, or BASE is not set (None), the bits are 0 and there is no
+    # displacement
 
-    return hexdisp
+    # Find the displacement from the next instruction to the label
+    disp = labeladdr - (curraddr + 3)
 
-def Format3(opcode, operand, curraddr, baseaddr):
-    
-    # Initialize empty string to return
-    formatstring = ""
+    # We check if displacement is in range for PC-relative addressing
+    if (-2048 <= disp <= 2047):
+        return 2, disp
 
-    # Check for START and END directives
-    if (opcode == "START"):
-        return ""
+    # Otherwise, the displacement from the base must be unsigned 12 bits
+    if (baseaddr is not None and 0 <= labeladdr - baseaddr <= 4095):
+        return 4, labeladdr - baseaddr
 
-    elif (opcode == "END"):
-        return ""
+    return 0, None
 
-    # Get the opcode for the instruction from OPTABLE
-    codeval = str(OPTAB.get(opcode))
+def Format3(opbyte, opcode, operand, curraddr, baseaddr):
+    
+    # Initialize empty list of parts to join and return
+    parts = []
 
     # We insert the opcode into the string
-    formatstring += FindOpcode(codeval, operand)
+    parts.append(FindOpcode(opbyte, operand))
 
-    formatstring += XBPE(opcode, operand, curraddr)
-
-    # Special case for RSUB
+    # Special case for RSUB, which has no operand
     if (opcode == "RSUB"):
-        formatstring += "000"
-        return formatstring
-
-    # Find the address of the next instruction
-    nextaddr = int(curraddr, 16) + 3
-
-    # We are adding an immediate value
-    if (operand[0] == '#' or operand[0] == '@'):
+        parts.append("0000")
+        return ''.join(parts)
 
-        # Check if the operand is in the symbol table
-        if (operand[1:] in SYMTAB):
+    # The 'x' bit is 8 if the operand is indexed
+    xbit = 8 if operand.endswith(',X') else 0
 
-            labeladdr = SYMTAB.get(operand[1:])
+    # Remove ',X' and any leading '#' or '@' to get the label once
+    label = operand[:-2] if xbit else operand
+    if (label[:1] in '#@'):
+        label = label[1:]
 
-            # We check if displacement is not in range for PC addressing
-            if ((int(curraddr, 16) + 3) - int(labeladdr, 16) > 2047 or \
-                (int(curraddr, 16) + 3) - int(labeladdr, 16) < -2048):
+    labeladdr = SYMTAB.get(label)
 
-                # We find the displacement between label address and base
-                basevar = (int(labeladdr, 16) - int(baseaddr, 16))
+    # If the operand is not a label, it must be a decimal number
+    if (labeladdr is None):
 
-                # We add the displacement to the string
-                formatstring += str(basevar).zfill(3)
+        # Otherwise, print error
+        if (not label.isdigit()):
+            print("Error: Operand not a label - " + label)
 
-            # Otherwise, we use PC-relative addressing
-            else:
-                # We check if we need to do 2's complement
-                disp = int(labeladdr, 16) - nextaddr
-
-                # We check if the displacement is negative
-                if (disp < 0):
-                    # We do 2's complement on the displacement
-                    formatstring += TwoComp(disp).zfill(3)
+        # The constant has to fit in the 12 bit displacement
+        elif (int(label) > 4095):
+            print("Error: Constant out of range for format 3 - " + label)
 
-                # Otherwise, we add the displacement to the string
-                else:
-                    formatstring += hex(disp)[2:].zfill(3)
-
-        # Otherwise we know it is a decimal number
         else:
+            parts.append(hex(xbit)[2:])
 
             # Get last 3 digits of value and convert to hex
-            formatstring += hex(int(operand[1:]))[2:].zfill(3)
+            parts.append(hex(int(label))[2:].zfill(3))
 
-    # Otherwise, we know that the instruction uses simple addressing
-    else:
+        return ''.join(parts)
 
-        # Check if operand has ',X'
-        if (operand[len(operand) - 1] == 'X'):
-            operand = operand[:len(operand) - 2]
+    # We find the 'b'/'p' bits and the displacement once for the label
+    bits, disp = EncodeDisp(curraddr, labeladdr, baseaddr)
 
-        # We find the address of the label in the operand
-        labeladdr = str(SYMTAB.get(operand))
+    # If the label cannot be reached, print error
+    if (disp is None):
+        print("Error: Label out of range for PC and base-relative " +
+              "addressing - " + label)
+        return ''.join(parts)
 
-        # We check if displacement is not in range for PC-relative addressing
-        if ((int(curraddr, 16) + 3) - int(SYMTAB.get(operand), 16) > 2047 or \
-            (int(curraddr, 16) + 3) - int(SYMTAB.get(operand), 16) < -2048):
+    # We add the XBPE bits to the string
+    parts.append(hex(xbit | bits)[2:])
 
-            basevar = int(labeladdr, 16) - int(baseaddr, 16)
+    # TwoComp gives the last 3 hex digits of the displacement, which also
+    # handles negative PC-relative displacements
+    parts.append(TwoComp(disp))
 
-            formatstring += str(basevar).zfill(3)
+    return ''.join(parts)
 
-        else:   
-            # We compare the two addresses to see if we use 2's complement
-            if (int(labeladdr, 16) > nextaddr):
+def Format2(opbyte, opcode, operand, curraddr, baseaddr):
 
-                # Label address in decimal representation
-                intlabel = int(labeladdr, 16)
-            
-                dispint = (intlabel - nextaddr)
+    # Initialize empty list of parts to join and return
+    parts = []
 
-                # We find last 3 digits of displacement of addresses
-                disp = hex(dispint)[2:].zfill(3)
-
-                # We append the displacement to the string
-                formatstring += disp
-        
-            # Otherwise, we need to use 2's complement
-            else:
-                # Label address in decimal representation
-                intlabel = int(labeladdr, 16)
-
-                disp = intlabel - nextaddr
-                formatstring += TwoComp(disp)
-
-    return formatstring
-
-def Format2(opcode, operand):
-
-    # Initialize empty string to return
-    formatstring = ""
-
-    # Get the opcode for the format 2 instruction
-    formatstring += FORM2.get(opcode)
+    # Add the opcode for the format 2 instruction
+    parts.append(format(opbyte, '02X'))
     
     # Bool to determine if there are 2 values in the operand
     tworegs = False
@@ -446,20 +385,20 @@ def Format2(opcode, operand):
         if (reglist[0] in REGS and reglist[1] in REGS):
         
             # Add both register values to the string
-            formatstring += REGS.get(reglist[0])
-            formatstring += REGS.get(reglist[1])
-            return formatstring
+            parts.append(REGS.get(reglist[0]))
+            parts.append(REGS.get(reglist[1]))
+            return ''.join(parts)
     
         # We check if the first register is SHIFTL or SHIFTR
         elif (opcode == "SHIFTL" or opcode == "SHIFTR"):
 
             # We get the register value
-            formatstring += REGS.get(reglist[0])        
+            parts.append(REGS.get(reglist[0]))        
 
             # We subtract 1 from the value
             reg2 = int(reglist[1]) - 1
 
-            formatstring += hex(reg2)[2:]
+            parts.append(hex(reg2)[2:])
 
         else:
             # Print an error message, register does not exist
@@ -469,227 +408,189 @@ def Format2(opcode, operand):
     elif (operand in REGS):
         
         # We add the value of the register to the string
-        formatstring += REGS.get(operand)
+        parts.append(REGS.get(operand))
 
         # We add a '0' because there is not second value
-        formatstring += '0'
+        parts.append('0')
 
     # Otherwise, we know the operand is a decimal value
     else:
         # We add the hex value of the operand to the string
-        formatstring += hex(int(operand))[2:]
+        parts.append(hex(int(operand))[2:])
 
         # We add a '0' because there is not a second value
-        formatstring += '0'
+        parts.append('0')
 
-    return formatstring
+    return ''.join(parts)
     
 
-def XBPE(opcode, operand, curraddr):
+def HandleRESB(elem, state):
 
-    midbits = 0
+    # Add two 0's to the string for every byte reserved
+    return "0" * (int(elem[3]) * 2)
 
-    # If there is no operand, we return 0
-    if (operand == ''):
-        return '0'
+def HandleRESW(elem, state):
 
-    # Check if operand is indexed
-    if (operand[len(operand) - 1] == 'X'):
-        midbits += 8
+    # Add six 0's to the string for every word reserved
+    return "0" * (int(elem[3]) * 6)
 
-        # Remove ',X' from the operand for rest of function
-        operand = operand[:len(operand) - 2]
+def HandleBYTE(elem, state):
 
-    # This will be true if the instruction is format 4
-    if (opcode[0] == '+'):
-        midbits += 1
+    # The body of the constant is between the quotes
+    body = elem[3][2:-1]
 
-        final = hex(midbits)[2:]
-        return final
+    # We check if the operand is given as a hex constant
+    if (elem[3].startswith('X')):
 
-    if (operand[0] == '#' or operand[0] == '@'):
-        operand = operand[1:]
+        # The body is already hex, so we only pad it to a whole byte
+        return body.zfill(len(body) + len(body) % 2)
 
-    # Otherwise, we know the instruction is format 3
-    if (operand in SYMTAB):
+    # We check if the operand is given as characters
+    elif (elem[3].startswith('C')):
 
-        # We check if displacement is not in range for PC-relative addressing
-        if ((int(curraddr, 16) + 3) - int(SYMTAB.get(operand), 16) > 2047 or \
-            (int(curraddr, 16) + 3) - int(SYMTAB.get(operand), 16) < -2048):
+        # Convert every character to its two digit hex value
+        return body.encode('latin-1').hex()
 
-            # We add 4 for 'b' bit
-            midbits += 4
-        
-        # Otherwise, we know the instruction uses PC-relative addressing
-        else:
-            # We add 2 for the 'p' bit
-            midbits += 2      
+    # Otherwise we know it is a decimal value, which has to fit in the
+    # single byte FindOffset reserved for it
+    if (not 0 <= int(elem[3]) <= 255):
+        print("Error: BYTE value out of range - " + elem[3])
+        return ""
 
-    return hex(midbits)[2:]
+    return hex(int(elem[3]))[2:].zfill(2)
 
-def FindForm(opcode):
+def HandleWORD(elem, state):
 
-    # Determine if the instruction format is format 4
-    if (opcode[0] == '+'):
-        return 4
+    # Add the hex value of the decimal string to the string
+    return hex(int(elem[3]))[2:].zfill(6)
 
-    # Otherwise, we know the instruction is format 3
-    else:
-        return 3
+def HandleBASE(elem, state):
 
-def SecondPass(infolist, target):
+    # Set the BASE register for the rest of the program
+    state["BASE"] = SYMTAB.get(elem[3])
 
-    basevar = '0'
+    # If the operand is not a label, print error
+    if (state["BASE"] is None):
+        print("Error: BASE operand not a label - " + elem[3])
 
-    for elem in infolist:
-        instrform = ""
+    return ""
 
-        # Bool to check for format 1/2
-        handled = False
+def HandleSkip(elem, state):
 
-        # Get the instruction from the table
-        code = elem[2]
+    # START and END are not assembled or listed
+    return None
 
-        # Check for the RESB directive
-        if (code == "RESB"):
+def Format1(opbyte, opcode, operand, curraddr, baseaddr):
 
-            # Find the number of 0's to add to the string
-            addzero = int(elem[3]) * 2
+    # Format 1 instructions are only the opcode
+    return format(opbyte, '02X')
 
-            # Add the correct number of 0's to the string
-            for c in range(0, addzero):
-                instrform += "0"
+# Maps every mnemonic to its FormatN function with the opcode and mnemonic
+# already bound, so it only needs the operand, the current address and the
+# BASE register to assemble the instruction. Every FormatN takes the same
+# arguments so they can be bound the same way, even if it does not use them
+ENCODERS = {1:Format1, 2:Format2, 3:Format3, 4:Format4}
+ENCODE = {mnemonic: functools.partial(ENCODERS[form], opbyte, mnemonic)
+          for mnemonic, (form, opbyte) in OPCODE_INFO.items()}
 
-        # Check for the RESW directive
-        elif (code == "RESW"):
+# Maps each directive to the function that assembles it, instructions are
+# assembled by their function in ENCODE
+DISPATCH = {"RESB":HandleRESB, "RESW":HandleRESW, "BYTE":HandleBYTE,
+            "WORD":HandleWORD, "BASE":HandleBASE, "START":HandleSkip,
+            "END":HandleSkip}
 
-            # Multiply the operand by 6 to get the number of bytes
-            addzero = int(elem[3]) * 6
+def SecondPass(infolist, target):
 
-            # We add the correct number of 0's to the string
-            for c in range(0, addzero):
-                instrform += "0"
+    # State shared with the handlers, holds the value of the BASE register,
+    # which is None until it is set
+    state = {"BASE": None}
 
-        # We check if the row is a comment
-        elif (elem[1][0] == '.'):
-            continue
+    # Buffers for the assembled bytes and the lines of the listing
+    output = bytearray()
+    listing = []
 
-        elif (code == "START"):
-            continue
+    # Local aliases for the lookups done on every row
+    eget = ENCODE.get
+    dget = DISPATCH.get
 
-        elif (code == "END"):
-            continue
+    for elem in infolist:
 
-        # We check for the BYTE directive
-        elif (code == "BYTE"):
-            
-            # We check if the operand is given as a hex constant
-            if (elem[3][0] == 'X'):
+        # We check if the row is a comment
+        if (elem[1].startswith('.')):
+            continue
 
-                # Add the operand to the string
-                instrform += str(elem[3][2:len(elem[3]) - 1].zfill(2))
+        # Get the instruction from the table
+        code = elem[2]
 
-            # We check if the operand is given as characters
-            elif (elem[3][0] == 'C'):
+        # Instructions are assembled by their encoder directly
+        encoder = eget(code)
+        if (encoder is not None):
+            instrform = encoder(elem[3], elem[0], state["BASE"])
 
-                # Find the operand
-                newstr = elem[3][2:len(elem[3]) - 1]
-                
-                # Iterate through each character and convert to integer
-                for char in newstr:
-                    newchar = ord(char)
-                    instrform += hex(newchar)[2:]
+        # Otherwise we assemble the row with the handler for its directive
+        else:
+            handler = dget(code)
 
-            # Otherwise we know it is a decimal value
+            # If the mnemonic is in neither table, return an error
+            if (handler is None):
+                print("Error: Instruction not valid - " + code)
+                instrform = ""
             else:
+                instrform = handler(elem, state)
 
-                # Convert the decimal value into a string
-                newstr = str(elem[3])
-
-                # Add the hex value of the decimal string to the final string
-                instrform += hex(newstr)
-
-        # We check for the WORD directive
-        elif (code == "WORD"):
-
-            # Add the hex value of the decimal string to the final string
-            instrform += hex(int(elem[3]))[2:].zfill(6)
-        
-        # We check if the BASE register is set
-        elif (code == "BASE"):
-            basevar = SYMTAB.get(elem[3])
-
-        # Handle format 1 instructions
-        elif (code in FORM1):
-            instrform += FORM1.get(code)
-            handled = True
-
-        # Handle format 2 instructions
-        elif (code in FORM2):
-            instrform += Format2(code, elem[3])
-            handled = True
-
-        # If the instruction is in neither, we check if it is in OPTABLE
-        elif (code in OPTAB or code[1:] in OPTAB):
-            # Find format of the instruction (3/4)
-            format = FindForm(code)
-
-            # Handle format 4 instructions
-            if (format == 4):
-
-                instrform += Format4(code, elem[3], elem[0])
-
-            # Handle format 3 instructions
-            elif (format == 3):
-                instrform += Format3(code, elem[3], elem[0], basevar)
+        # Rows without a string are skipped
+        if (instrform is None):
+            continue
 
-        # Otherwise, if none above, return an error
-        else:
-            print("Error: Instruction not valid - "),
-            print(code)
+        # Add the assembled bytes of the instruction to the output buffer,
+        # rows that did not assemble to whole bytes are reported and listed
+        # without object code
+        try:
+            output.extend(bytes.fromhex(instrform))
+        except ValueError:
+            print("Error: Could not assemble - " + elem[2] + " " + elem[3])
+            instrform = ""
 
         # Append the instruction string to the list in the table
         elem.append(instrform)
 
-        # Convert the instruction format to ASCII characters
-        writebytes = ''.join(chr(int(instrform[i:i+2], 16)) \
-                             for i in range(0, len(instrform), 2))
+        # Format the offset of the row as a hex string
+        if (elem[0] is None):
+            offset = "     "
+        else:
+            offset = format(elem[0], '05x')
 
-        # Write the instruction to the .exe file
-        target.write(writebytes)
+        # Add the row to the listing, the 0's of RESB and RESW are left out
+        if (code == "RESB" or code == "RESW"):
+            listing.append('\t'.join([offset] + elem[1:4]))
+        else:
+            listing.append('\t'.join([offset] + elem[1:]))
 
-        # Loop to print table to screen
-        for col in elem:
-            if (col == "RESB" or col == "RESW"):
-                print(col),
-                print('\t'),
-                print(elem[3]),
-                break
-            else:
-                print(col),           
-                print("\t"),
+    # Write the assembled program to the .exe file
+    target.write(output)
 
-        print('')
+    # Print the annotated listing to screen
+    print('\n'.join(listing))
 
     return
 
 def NewFile(filename):
 
     # Create a new .exe file using filename from command line arguments
-    newfile = filename[:len(filename) - 4] + ".exe"
+    newfile = filename[:-4] + ".exe"
 
     return newfile
 
 def main():
 
-    # Create new target file to write to
-    target = open(NewFile(sys.argv[1]), 'w')
-
     # Create a table of row elements and symbol table
     parseline = FirstPass(sys.argv[1])
 
-    # Assemble the instructions and write to .exe file
-    SecondPass(parseline, target)
+    # Create new target file to write to
+    with open(NewFile(sys.argv[1]), 'wb') as target:
+
+        # Assemble the instructions and write to .exe file
+        SecondPass(parseline, target)
 
     return
 